@@ -20,10 +20,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     应用生命周期管理
     """
     # 启动事件
-    await startup_handler()
+    await startup_handler(app)
     yield
     # 关闭事件
-    await shutdown_handler()
+    await shutdown_handler(app)
 
 def create_app() -> FastAPI:
     """
@@ -1,34 +1,90 @@
 # api/deps.py
+import hashlib
+import time
 from typing import AsyncGenerator, Annotated
+from cachetools import TLRUCache, TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+import jwt
+from jwt import InvalidTokenError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.db.session import async_session
 from app.schemas.token import TokenPayload
+from app.schemas.user import UserInDB
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
+# JWT解码参数(模块级常量，避免每次解码重复构造)
+_JWT_ALGS = ("HS256",)
+_JWT_KEY = settings.SECRET_KEY.encode()
+
+# 令牌缓存最长存活时间(秒)
+TOKEN_CACHE_MAX_TTL = 300
+
+def _token_ttu(key: bytes, payload: TokenPayload, now: float) -> float:
+    """缓存条目在令牌过期或超过最长存活时间时失效"""
+    return min(payload.exp.timestamp(), now + TOKEN_CACHE_MAX_TTL)
+
+# 已验证令牌的载荷缓存(键为令牌摘要，只缓存校验通过的令牌)
+_token_cache: TLRUCache = TLRUCache(
+    maxsize=10000,
+    ttu=_token_ttu,
+    timer=time.time
+)
+
+def decode_token(token: str) -> TokenPayload:
+    """
+    解码并校验JWT令牌
+
+    校验通过的载荷(不可变的 TokenPayload)会被缓存，同一令牌的后续请求
+    直接命中缓存，无需重复进行签名校验和模型验证。
+    签名无效或载荷格式错误时抛出 InvalidTokenError。
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    token_data = _token_cache.get(key)
+    if token_data is None:
+        payload = jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGS)
+        try:
+            token_data = TokenPayload.model_validate(payload)
+        except ValidationError as e:
+            raise InvalidTokenError("Invalid token payload") from e
+        _token_cache[key] = token_data
+    return token_data
+
+# 当前用户缓存(键为用户ID)，合并同一用户并发请求的主键查询
+# 缓存的是加载后生成的不可变快照(UserInDB)，而非绑定会话的ORM实例，
+# 因此不会受请求回滚(实例过期)或其他请求中未提交修改的影响；
+# 需要修改用户时应通过 db.get 加载ORM实例
+_user_cache: TTLCache = TTLCache(maxsize=1000, ttl=30)
+
+def invalidate_cached_user(user_id: int) -> None:
+    """
+    使用户缓存失效(用户信息变更后调用)
+    """
+    _user_cache.pop(user_id, None)
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     数据库会话依赖
     """
+    # 每个请求一个事务，出现异常时回滚
+    # 依赖的清理在响应发送之后才执行，写操作需由端点在返回前显式提交
+    # 退出上下文管理器时会自动关闭会话
     async with async_session() as session:
-        try:
+        async with session.begin():
             yield session
-        finally:
-            await session.close()
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
+) -> UserInDB:
     """
-    获取当前用户
+    获取当前用户(不可变快照)
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,16 +92,16 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, 
-            settings.SECRET_KEY, 
-            algorithms=["HS256"]
-        )
-        token_data = TokenPayload(**payload)
-    except JWTError:
+        token_data = decode_token(token)
+        user_id = int(token_data.sub)
+    except (InvalidTokenError, ValueError):
         raise credentials_exception
     
-    user = await db.get(User, token_data.sub)
+    user = _user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        db_user = await db.get(User, user_id)
+        if db_user is None:
+            raise credentials_exception
+        user = UserInDB.model_validate(db_user)
+        _user_cache[user_id] = user
     return user
\ No newline at end of file
@@ -3,13 +3,18 @@ from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from jwt import InvalidTokenError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import (
+    get_db,
+    get_current_user,
+    decode_token,
+    invalidate_cached_user,
+)
 from app.core.config import settings
 from app.schemas.token import Token
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.schemas.user import UserCreate, UserInDB, UserResponse, UserUpdate
 from app.models.user import User
 from app.services.auth import AuthService
 
@@ -68,7 +73,10 @@ async def register(
     """
     注册新用户
     """
-    return await AuthService.create_user(user_in, db)
+    user = await AuthService.create_user(user_in, db)
+    # 在返回响应前提交，提交失败时客户端能收到错误
+    await db.commit()
+    return user
 
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
@@ -80,12 +88,8 @@ async def refresh_token(
     """
     try:
         # 验证刷新令牌
-        payload = jwt.decode(
-            refresh_token, 
-            settings.SECRET_KEY, 
-            algorithms=["HS256"]
-        )
-        user_id = int(payload["sub"])
+        token_data = decode_token(refresh_token)
+        user_id = int(token_data.sub)
         
         # 获取用户
         user = await db.get(User, user_id)
@@ -114,7 +118,7 @@ async def refresh_token(
             ),
             token_type="bearer"
         )
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
@@ -122,8 +126,8 @@ async def refresh_token(
 
 @router.get("/me", response_model=UserResponse)
 async def read_users_me(
-    current_user: Annotated[User, Depends(get_current_user)]
-) -> User:
+    current_user: Annotated[UserInDB, Depends(get_current_user)]
+) -> UserInDB:
     """
     获取当前用户信息
     """
@@ -132,7 +136,7 @@ async def read_users_me(
 @router.put("/me", response_model=UserResponse)
 async def update_user_me(
     user_update: UserUpdate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[UserInDB, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ) -> User:
     """
@@ -148,4 +152,7 @@ async def update_user_me(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    # 先提交再使缓存失效，避免并发请求在提交前重新缓存旧数据
+    await db.commit()
+    invalidate_cached_user(current_user.id)
     return user
\ No newline at end of file
@@ -1,16 +1,18 @@
 # middlewares/exception.py
+import asyncio
+import itertools
+import json
 import sys
+import threading
 import time
 import traceback
-from typing import Callable
 from datetime import datetime
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError as PydanticValidationError
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.api.middlewares.response import get_request_id
 from app.exceptions.base import AppException
 from app.schemas.error import ErrorResponse
 from app.utils.logger import get_logger
@@ -18,7 +20,67 @@ from app.core.config import settings
 
 logger = get_logger()
 
-class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
+# 预序列化的错误响应模板(字段顺序与 ErrorResponse 一致)，仅替换随请求变化的部分
+_VALIDATION_ERROR_TEMPLATE = (
+    b'{"error_code":4000,"message":"Validation error",'
+    b'"details":%b,"trace_id":%b}'
+)
+_UNKNOWN_ERROR_TEMPLATE = (
+    b'{"error_code":5001,"message":"Internal server error",'
+    b'"details":null,"trace_id":%b}'
+)
+
+# 告警批量发送配置: 累计条数达到上限或等待超时后合并发送
+ALERT_BATCH_SIZE = 10
+ALERT_BATCH_TIMEOUT = 1.0  # 秒
+
+# 秒级时间戳缓存，同一秒内的错误复用已格式化的字符串
+_last_timestamp_sec = 0
+_last_timestamp_str = ""
+
+def _now_iso() -> str:
+    """获取当前时间的ISO格式字符串(秒级精度)"""
+    global _last_timestamp_sec, _last_timestamp_str
+    current_sec = int(time.time())
+    if current_sec != _last_timestamp_sec:
+        _last_timestamp_sec = current_sec
+        _last_timestamp_str = datetime.fromtimestamp(current_sec).isoformat()
+    return _last_timestamp_str
+
+async def send_alerts(alerts: list[dict]) -> None:
+    """发送错误告警
+    这里可以集成告警系统，如邮件、钉钉、企业微信等
+    """
+    logger.critical(
+        "Error alert triggered",
+        extra={
+            "alert_count": len(alerts),
+            "alerts": alerts
+        }
+    )
+
+async def consume_alerts(queue: asyncio.Queue) -> None:
+    """
+    告警消费任务(由应用生命周期管理)
+    
+    从告警队列中取出告警，累计 ALERT_BATCH_SIZE 条或等待
+    ALERT_BATCH_TIMEOUT 秒后合并为一次发送，减少告警通道I/O。
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + ALERT_BATCH_TIMEOUT
+        while len(batch) < ALERT_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        await send_alerts(batch)
+
+class ExceptionHandlerMiddleware:
     """
     全局异常处理中间件
     
@@ -36,41 +98,100 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
     app.add_middleware(ExceptionHandlerMiddleware)
     ```
     """
-    async def dispatch(
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
         try:
-            return await call_next(request)
-            
-        except AppException as e:
+            await self.app(scope, receive, send_wrapper)
+            return
+        except Exception as e:
+            # 响应已开始发送时无法再返回错误响应
+            if response_started:
+                raise
+            response = self._handle_exception(e, Request(scope))
+        
+        await response(scope, receive, send)
+    
+    def _handle_exception(
+        self,
+        exc: Exception,
+        request: Request
+    ) -> Response:
+        """根据异常类型分发处理"""
+        if isinstance(exc, AppException):
             # 处理应用自定义异常
-            return self._handle_app_exception(e, request)
-            
-        except PydanticValidationError as e:
+            return self._handle_app_exception(exc, request)
+        
+        if isinstance(exc, PydanticValidationError):
             # 处理Pydantic验证异常
-            return self._handle_validation_error(e, request)
-            
-        except SQLAlchemyError as e:
+            return self._handle_validation_error(exc, request)
+        
+        if isinstance(exc, SQLAlchemyError):
             # 处理数据库异常
-            return self._handle_database_error(e, request)
-            
-        except Exception as e:
-            # 处理其他未预期的异常
-            return self._handle_unknown_error(e, request)
+            return self._handle_database_error(exc, request)
+        
+        # 处理其他未预期的异常
+        return self._handle_unknown_error(exc, request)
+    
+    @staticmethod
+    def _render(
+        error_response: ErrorResponse,
+        status_code: int
+    ) -> Response:
+        """直接将错误响应序列化为JSON字节，省去中间dict及json.dumps"""
+        return Response(
+            content=error_response.model_dump_json(),
+            status_code=status_code,
+            media_type="application/json"
+        )
+    
+    @staticmethod
+    def _render_template(
+        template: bytes,
+        status_code: int,
+        *values: bytes
+    ) -> Response:
+        """将各部分JSON字节填入预序列化模板，跳过模型构造与序列化"""
+        return Response(
+            content=template % values,
+            status_code=status_code,
+            media_type="application/json"
+        )
+    
+    @staticmethod
+    def _dump_trace_id(request: Request) -> bytes:
+        """将追踪ID序列化为JSON字节"""
+        return json.dumps(get_request_id(request.scope)).encode()
     
     def _handle_app_exception(
         self,
         exc: AppException,
         request: Request
-    ) -> JSONResponse:
+    ) -> Response:
         """处理应用自定义异常"""
         error_response = ErrorResponse(
             error_code=exc.error_code,
             message=exc.detail,
             details=exc.details,
-            trace_id=getattr(request.state, "request_id", None)
+            trace_id=get_request_id(request.scope)
         )
         
         # 记录错误日志
@@ -84,24 +205,14 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             }
         )
         
-        return JSONResponse(
-            status_code=exc.status_code,
-            content=error_response.model_dump()
-        )
+        return self._render(error_response, exc.status_code)
     
     def _handle_validation_error(
         self,
         exc: PydanticValidationError,
         request: Request
-    ) -> JSONResponse:
+    ) -> Response:
         """处理Pydantic验证异常"""
-        error_response = ErrorResponse(
-            error_code=4000,
-            message="Validation error",
-            details=exc.errors(),
-            trace_id=getattr(request.state, "request_id", None)
-        )
-        
         logger.warning(
             "Validation error",
             extra={
@@ -111,22 +222,25 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             }
         )
         
-        return JSONResponse(
-            status_code=400,
-            content=error_response.model_dump()
+        # exc.json() 由pydantic-core直接序列化，可安全处理错误上下文中的异常对象
+        return self._render_template(
+            _VALIDATION_ERROR_TEMPLATE,
+            400,
+            exc.json().encode(),
+            self._dump_trace_id(request)
         )
     
     def _handle_database_error(
         self,
         exc: SQLAlchemyError,
         request: Request
-    ) -> JSONResponse:
+    ) -> Response:
         """处理数据库异常"""
         error_response = ErrorResponse(
             error_code=5000,
             message="Database error occurred",
             details=str(exc) if settings.DEBUG else None,
-            trace_id=getattr(request.state, "request_id", None)
+            trace_id=get_request_id(request.scope)
         )
         
         logger.error(
@@ -139,34 +253,14 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             exc_info=True
         )
         
-        return JSONResponse(
-            status_code=500,
-            content=error_response.model_dump()
-        )
+        return self._render(error_response, 500)
     
     def _handle_unknown_error(
         self,
         exc: Exception,
         request: Request
-    ) -> JSONResponse:
+    ) -> Response:
         """处理未知异常"""
-        error_response = ErrorResponse(
-            error_code=5001,
-            message="Internal server error",
-            trace_id=getattr(request.state, "request_id", None)
-        )
-        
-        # 在开发环境下添加堆栈信息
-        if settings.DEBUG:
-            error_response.details = {
-                "error": str(exc),
-                "traceback": traceback.format_exception(
-                    type(exc),
-                    exc,
-                    exc.__traceback__
-                )
-            }
-        
         # 记录错误日志
         logger.error(
             f"Unhandled error: {str(exc)}",
@@ -178,12 +272,29 @@ class ExceptionHandlerMiddleware(BaseHTTPMiddleware):
             exc_info=True
         )
         
-        return JSONResponse(
-            status_code=500,
-            content=error_response.model_dump()
+        # 非开发环境下响应体仅追踪ID不同，直接使用模板
+        if not settings.DEBUG:
+            return self._render_template(
+                _UNKNOWN_ERROR_TEMPLATE,
+                500,
+                self._dump_trace_id(request)
+            )
+        
+        # 在开发环境下添加堆栈信息
+        error_response = ErrorResponse(
+            error_code=5001,
+            message="Internal server error",
+            details={
+                "error": str(exc),
+                "traceback": list(
+                    traceback.TracebackException.from_exception(exc).format()
+                )
+            },
+            trace_id=get_request_id(request.scope)
         )
+        return self._render(error_response, 500)
 
-class ErrorLoggingMiddleware(BaseHTTPMiddleware):
+class ErrorLoggingMiddleware:
     """
     错误日志记录中间件
     
@@ -209,59 +320,80 @@ class ErrorLoggingMiddleware(BaseHTTPMiddleware):
         alert_threshold: int = 10,
         alert_interval: int = 60
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.alert_threshold = alert_threshold
         self.alert_interval = alert_interval
-        self.error_count = 0
-        self.last_alert_time = 0
+        # 错误总数自增计数器，告警时以当前总数作为新的基线
+        self._next_error_count = itertools.count(1).__next__
+        self._alert_baseline = 0
+        self._last_alert_time = float("-inf")
+        self._alert_lock = threading.Lock()
+        self._alert_tasks: set[asyncio.Task] = set()
     
-    async def _should_send_alert(self) -> bool:
+    def _should_send_alert(self, error_count: int) -> bool:
         """检查是否需要发送告警"""
-        current_time = int(time.time())
-        if (self.error_count >= self.alert_threshold and 
-            current_time - self.last_alert_time > self.alert_interval):
-            self.last_alert_time = current_time
-            self.error_count = 0
+        if error_count - self._alert_baseline < self.alert_threshold:
+            return False
+        
+        current_time = time.monotonic()
+        with self._alert_lock:
+            if (error_count - self._alert_baseline < self.alert_threshold or
+                current_time - self._last_alert_time <= self.alert_interval):
+                return False
+            self._last_alert_time = current_time
+            self._alert_baseline = error_count
             return True
-        return False
     
-    async def _send_alert(self, error_info: dict) -> None:
-        """发送错误告警
-        这里可以集成告警系统，如邮件、钉钉、企业微信等
-        """
-        logger.critical(
-            "Error alert triggered",
-            extra={
-                "error_count": self.error_count,
-                "threshold": self.alert_threshold,
-                "error_info": error_info
-            }
-        )
+    def _dispatch_alert(self, scope: Scope, alert: dict) -> None:
+        """将告警放入应用告警队列，由后台任务统一发送"""
+        app = scope.get("app")
+        alert_queue = getattr(getattr(app, "state", None), "alert_queue", None)
+        if alert_queue is None:
+            # 未配置告警队列时直接在后台任务中发送
+            task = asyncio.create_task(send_alerts([alert]))
+            self._alert_tasks.add(task)
+            task.add_done_callback(self._alert_tasks.discard)
+            return
+        
+        try:
+            alert_queue.put_nowait(alert)
+        except asyncio.QueueFull:
+            # 队列已满时丢弃告警，避免阻塞请求
+            pass
     
-    async def dispatch(
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send)
             
         except Exception as e:
             # 增加错误计数
-            self.error_count += 1
+            error_count = self._next_error_count()
             
             # 构建错误信息
             error_info = {
-                "path": request.url.path,
-                "method": request.method,
+                "path": scope["path"],
+                "method": scope["method"],
                 "error_type": type(e).__name__,
                 "error_message": str(e),
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }
             
-            # 检查是否需要告警
-            if await self._should_send_alert():
-                await self._send_alert(error_info)
+            # 检查是否需要告警(告警在后台发送，不阻塞异常传播)
+            if self._should_send_alert(error_count):
+                self._dispatch_alert(scope, {
+                    "error_count": error_count,
+                    "threshold": self.alert_threshold,
+                    "error_info": error_info
+                })
             
             raise
 
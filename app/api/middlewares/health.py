@@ -0,0 +1,58 @@
+# middlewares/health.py
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# 预构建的健康检查响应
+_HEALTH_BODY = b'{"ok":true}'
+_HEALTH_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_HEALTH_BODY)).encode()),
+]
+
+class HealthCheckMiddleware:
+    """
+    健康检查中间件
+    
+    功能：
+    1. 直接响应健康检查探针请求
+    2. 探针请求不进入后续中间件及路由
+    
+    注意：需作为最外层中间件注册(最后调用 add_middleware)
+    
+    使用方法：
+    ```python
+    from app.middlewares.health import HealthCheckMiddleware
+    
+    app = FastAPI()
+    app.add_middleware(
+        HealthCheckMiddleware,
+        paths={"/health"}
+    )
+    ```
+    """
+    def __init__(
+        self,
+        app: ASGIApp,
+        paths: set[str] | None = None
+    ) -> None:
+        self.app = app
+        self.paths = frozenset(paths or {"/health"})
+    
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": _HEALTH_HEADERS,
+        })
+        await send({
+            "type": "http.response.body",
+            "body": _HEALTH_BODY,
+        })
@@ -1,15 +1,29 @@
 # middlewares/logging.py
 import time
-from typing import Callable
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi import FastAPI, Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.api.middlewares.response import get_request_id
 from app.utils.logger import get_logger
 from app.core.config import settings
 
 logger = get_logger()
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+def _tee_receive(
+    receive: Receive,
+    buffer: bytearray,
+    limit: int
+) -> Receive:
+    """构造一个在转发请求体的同时将其复制到buffer的receive(最多limit字节)"""
+    async def tee() -> Message:
+        message = await receive()
+        if message["type"] == "http.request" and len(buffer) < limit:
+            buffer.extend(message.get("body", b"")[:limit - len(buffer)])
+        return message
+    
+    return tee
+
+class RequestLoggingMiddleware:
     """
     请求日志中间件
     
@@ -18,6 +32,10 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
     2. 记录响应信息
     3. 记录性能指标
     4. 支持敏感信息过滤
+    5. 记录慢请求
+    
+    请求/响应日志依赖 ResponseMiddleware 生成的请求ID，缺少请求ID时
+    仅记录慢请求和性能信息。
     
     使用方法：
     ```python
@@ -27,7 +45,8 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
     app.add_middleware(
         RequestLoggingMiddleware,
         exclude_paths=["/health", "/metrics"],
-        sensitive_headers={"authorization", "cookie"}
+        sensitive_headers={"authorization", "cookie"},
+        slow_request_threshold=1.0  # 1秒
     )
     ```
     """
@@ -36,23 +55,55 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         app: ASGIApp,
         exclude_paths: set[str] | None = None,
         sensitive_headers: set[str] | None = None,
-        log_request_body: bool = False
+        log_request_body: bool = False,
+        slow_request_threshold: float = 1.0,  # 1秒
+        max_body_log_size: int = 64 * 1024  # 64KB
     ) -> None:
-        super().__init__(app)
-        self.exclude_paths = exclude_paths or {"/health", "/metrics"}
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths or {"/health", "/metrics"})
         self.sensitive_headers = sensitive_headers or {"authorization", "cookie"}
         self.log_request_body = log_request_body
+        self.max_body_log_size = max_body_log_size
+        self.slow_request_threshold = slow_request_threshold
+        self._slow_request_threshold_ns = int(slow_request_threshold * 1e9)
+        # ASGI原始请求头名均为小写bytes，预先编码以便直接比较
+        self._sensitive_bytes = {
+            h.lower().encode("latin-1") for h in self.sensitive_headers
+        }
     
     def _mask_sensitive_headers(
         self,
-        headers: dict[str, str]
+        raw_headers: list[tuple[bytes, bytes]]
     ) -> dict[str, str]:
         """掩码敏感header信息"""
         return {
-            k: "***" if k.lower() in self.sensitive_headers else v
-            for k, v in headers.items()
+            k.decode("latin-1"): (
+                "***" if k in self._sensitive_bytes else v.decode("latin-1")
+            )
+            for k, v in raw_headers
         }
     
+    def _should_log_body(self, scope: Scope) -> bool:
+        """仅记录大小受限的JSON请求体"""
+        if not self.log_request_body:
+            return False
+        
+        content_type = b""
+        content_length = None
+        for k, v in scope["headers"]:
+            if k == b"content-type":
+                content_type = v
+            elif k == b"content-length":
+                content_length = v
+        
+        if not content_type.startswith(b"application/json"):
+            return False
+        return (
+            content_length is None or
+            not content_length.isdigit() or
+            int(content_length) <= self.max_body_log_size
+        )
+    
     async def log_request(
         self,
         request: Request,
@@ -60,8 +111,7 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
     ) -> None:
         """记录请求信息"""
         # 获取请求头
-        headers = dict(request.headers)
-        masked_headers = self._mask_sensitive_headers(headers)
+        masked_headers = self._mask_sensitive_headers(request.scope["headers"])
         
         # 基本请求信息
         log_data = {
@@ -73,175 +123,156 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             "headers": masked_headers
         }
         
-        # 可选择是否记录请求体
-        if self.log_request_body:
-            try:
-                body = await request.json()
-                log_data["body"] = body
-            except:
-                pass
-        
         logger.info(
             f"Request received: {request.method} {request.url.path}",
             extra=log_data
         )
     
+    async def log_body(
+        self,
+        request_id: str,
+        body: bytearray
+    ) -> None:
+        """记录请求体"""
+        logger.info(
+            "Request body",
+            extra={
+                "request_id": request_id,
+                "body": body.decode("utf-8", "replace")
+            }
+        )
+    
     async def log_response(
         self,
-        response: Response,
+        status_code: int,
+        headers: MutableHeaders,
         request_id: str,
-        duration: float
+        duration_ns: int
     ) -> None:
         """记录响应信息"""
         logger.info(
             "Request completed",
             extra={
                 "request_id": request_id,
-                "status_code": response.status_code,
-                "duration": f"{duration:.3f}s",
-                "response_headers": dict(response.headers)
+                "status_code": status_code,
+                "duration_ms": duration_ns // 1_000_000,
+                "response_headers": dict(headers)
             }
         )
     
-    async def dispatch(
+    async def log_performance(
         self,
         request: Request,
-        call_next: Callable
-    ) -> Response:
+        status_code: int,
+        duration_ns: int
+    ) -> None:
+        """记录性能信息"""
+        # 记录慢请求
+        if duration_ns > self._slow_request_threshold_ns:
+            logger.warning(
+                "Slow request detected",
+                extra={
+                    "method": request.method,
+                    "path": request.url.path,
+                    "duration_ms": duration_ns // 1_000_000,
+                    "threshold_ms": self._slow_request_threshold_ns // 1_000_000
+                }
+            )
+        
+        # 如果开启了DEBUG模式，记录所有请求的性能信息
+        if settings.DEBUG:
+            logger.debug(
+                "Request performance metrics",
+                extra={
+                    "method": request.method,
+                    "path": request.url.path,
+                    "duration_ms": duration_ns // 1_000_000,
+                    "status_code": status_code
+                }
+            )
+    
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
         # 检查是否需要跳过日志记录
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
         
-        # 获取请求ID
-        request_id = getattr(request.state, "request_id", None)
-        if not request_id:
-            return await call_next(request)
+        # 获取请求ID(无请求ID时仅记录性能信息)
+        request_id = get_request_id(scope)
+        request = Request(scope)
         
         # 记录请求开始时间
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
         
         # 记录请求信息
-        await self.log_request(request, request_id)
+        if request_id:
+            await self.log_request(request, request_id)
+        
+        # 可选择是否记录请求体(在下游读取时同步复制，不额外读取请求流)
+        body_buffer = None
+        if request_id and self._should_log_body(scope):
+            body_buffer = bytearray()
+            receive = _tee_receive(receive, body_buffer, self.max_body_log_size)
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # 计算请求处理时间
+                duration_ns = time.perf_counter_ns() - start_ns
+                headers = MutableHeaders(scope=message)
+                
+                # 记录响应及性能信息
+                if request_id:
+                    await self.log_response(
+                        message["status"],
+                        headers,
+                        request_id,
+                        duration_ns
+                    )
+                await self.log_performance(request, message["status"], duration_ns)
+                
+                # 添加处理时间到响应头
+                headers["X-Process-Time"] = f"{duration_ns / 1e9:.3f}s"
+            await send(message)
         
         try:
             # 处理请求
-            response = await call_next(request)
-            
-            # 计算请求处理时间
-            duration = time.time() - start_time
-            
-            # 记录响应信息
-            await self.log_response(response, request_id, duration)
-            
-            # 添加处理时间到响应头
-            response.headers["X-Process-Time"] = f"{duration:.3f}s"
-            
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             # 记录错误信息
-            duration = time.time() - start_time
+            duration_ns = time.perf_counter_ns() - start_ns
             logger.error(
                 f"Request failed: {str(e)}",
                 extra={
                     "request_id": request_id,
                     "error": str(e),
-                    "duration": f"{duration:.3f}s"
+                    "duration_ms": duration_ns // 1_000_000
                 },
                 exc_info=True if settings.DEBUG else False
             )
             raise
-
-class PerformanceLoggingMiddleware(BaseHTTPMiddleware):
-    """
-    性能日志中间件
-    
-    功能：
-    1. 记录请求处理时间
-    2. 记录慢请求
-    3. 记录资源使用情况
-    
-    使用方法：
-    ```python
-    from app.middlewares.logging import PerformanceLoggingMiddleware
-    
-    app = FastAPI()
-    app.add_middleware(
-        PerformanceLoggingMiddleware,
-        slow_request_threshold=1.0  # 1秒
-    )
-    ```
-    """
-    def __init__(
-        self,
-        app: ASGIApp,
-        slow_request_threshold: float = 1.0,  # 1秒
-        exclude_paths: set[str] | None = None
-    ) -> None:
-        super().__init__(app)
-        self.slow_request_threshold = slow_request_threshold
-        self.exclude_paths = exclude_paths or {"/health", "/metrics"}
-    
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
-        # 检查是否需要跳过
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
-        
-        start_time = time.time()
-        response = await call_next(request)
-        duration = time.time() - start_time
         
-        # 记录慢请求
-        if duration > self.slow_request_threshold:
-            logger.warning(
-                "Slow request detected",
-                extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "duration": f"{duration:.3f}s",
-                    "threshold": f"{self.slow_request_threshold:.3f}s"
-                }
-            )
-        
-        # 如果开启了DEBUG模式，记录所有请求的性能信息
-        if settings.DEBUG:
-            logger.debug(
-                "Request performance metrics",
-                extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "duration": f"{duration:.3f}s",
-                    "status_code": response.status_code
-                }
-            )
-        
-        return response
+        finally:
+            if body_buffer:
+                await self.log_body(request_id, body_buffer)
 
 # 使用示例
 """
 from fastapi import FastAPI
-from app.middlewares.logging import (
-    RequestLoggingMiddleware,
-    PerformanceLoggingMiddleware
-)
+from app.middlewares.logging import RequestLoggingMiddleware
 
 app = FastAPI()
 
-# 添加中间件（注意顺序）
 app.add_middleware(
     RequestLoggingMiddleware,
     exclude_paths={"/health", "/metrics"},
     sensitive_headers={"authorization", "cookie"},
-    log_request_body=settings.DEBUG
-)
-
-app.add_middleware(
-    PerformanceLoggingMiddleware,
-    slow_request_threshold=1.0,
-    exclude_paths={"/health", "/metrics"}
+    log_request_body=settings.DEBUG,
+    slow_request_threshold=1.0
 )
 """
\ No newline at end of file
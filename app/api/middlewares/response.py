@@ -1,15 +1,35 @@
 # middlewares/response.py
+import itertools
+import os
 import time
-import uuid
-from typing import Callable
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi import FastAPI, Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.utils.logger import get_logger
 
 logger = get_logger()
 
-class ResponseMiddleware(BaseHTTPMiddleware):
+# 请求ID = 进程前缀(PID + 启动时间) + 进程内自增序号，保证跨worker唯一
+def _reset_request_id() -> None:
+    """重新计算进程前缀并重置序号(fork出的子进程需重新生成)"""
+    global _REQUEST_ID_PREFIX, _request_counter
+    _REQUEST_ID_PREFIX = f"{os.getpid():x}{int(time.time()):x}"
+    _request_counter = itertools.count().__next__
+
+_reset_request_id()
+if hasattr(os, "register_at_fork"):
+    # 预加载应用后fork的worker会继承父进程的前缀，需在子进程中重置
+    os.register_at_fork(after_in_child=_reset_request_id)
+
+def generate_request_id() -> str:
+    """生成请求ID"""
+    return f"{_REQUEST_ID_PREFIX}-{_request_counter():x}"
+
+def get_request_id(scope: Scope) -> str | None:
+    """从ASGI scope中获取请求ID(由 ResponseMiddleware 写入)"""
+    return scope.get("request_id")
+
+class ResponseMiddleware:
     """
     响应处理中间件
     
@@ -32,46 +52,46 @@ class ResponseMiddleware(BaseHTTPMiddleware):
         request_id_header: str = "X-Request-ID",
         process_time_header: str = "X-Process-Time",
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.request_id_header = request_id_header
         self.process_time_header = process_time_header
     
-    async def dispatch(
+    async def __call__(
         self, 
-        request: Request, 
-        call_next: Callable
-    ) -> Response:
-        # 生成请求ID
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        scope: Scope, 
+        receive: Receive, 
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # 生成请求ID并写入scope，供下游中间件及路由读取
+        request_id = generate_request_id()
+        scope["request_id"] = request_id
         
         # 记录开始时间
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
+        status_code = None
+        process_time_ns = 0
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, process_time_ns
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                
+                # 添加请求ID到响应头
+                headers[self.request_id_header] = request_id
+                
+                # 计算并添加处理时间到响应头
+                process_time_ns = time.perf_counter_ns() - start_ns
+                headers[self.process_time_header] = f"{process_time_ns / 1e9:.3f}"
+            await send(message)
         
         try:
             # 处理请求
-            response = await call_next(request)
-            
-            # 添加请求ID到响应头
-            response.headers[self.request_id_header] = request_id
-            
-            # 计算并添加处理时间到响应头
-            process_time = time.time() - start_time
-            response.headers[self.process_time_header] = str(process_time)
-            
-            # 记录请求信息
-            logger.info(
-                f"Request processed",
-                extra={
-                    "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "process_time": process_time,
-                    "status_code": response.status_code
-                }
-            )
-            
-            return response
+            await self.app(scope, receive, send_wrapper)
             
         except Exception as e:
             # 记录错误
@@ -79,14 +99,26 @@ class ResponseMiddleware(BaseHTTPMiddleware):
                 f"Request failed: {str(e)}",
                 extra={
                     "request_id": request_id,
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": scope["method"],
+                    "path": scope["path"],
                     "error": str(e)
                 }
             )
             raise
+        
+        # 记录请求信息
+        logger.info(
+            f"Request processed",
+            extra={
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "process_time_ms": process_time_ns // 1_000_000,
+                "status_code": status_code
+            }
+        )
 
-class RequestValidationMiddleware(BaseHTTPMiddleware):
+class RequestValidationMiddleware:
     """
     请求验证中间件
     
@@ -112,36 +144,55 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
         max_content_length: int = 1024 * 1024,  # 1MB
         allowed_content_types: set[str] | None = None
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.max_content_length = max_content_length
         self.allowed_content_types = allowed_content_types or {
             "application/json",
             "application/x-www-form-urlencoded",
             "multipart/form-data"
         }
+        # 预先编码为bytes，直接与ASGI原始请求头比较
+        self._allowed_content_types = {
+            ct.lower().encode("latin-1") for ct in self.allowed_content_types
+        }
     
-    async def dispatch(
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        content_type = b""
+        content_length = 0
+        for k, v in scope["headers"]:
+            if k == b"content-type":
+                content_type = v.split(b";", 1)[0].strip().lower()
+            elif k == b"content-length":
+                content_length = int(v)
+        
         # 验证Content-Type
-        content_type = request.headers.get("content-type", "").split(";")[0]
-        if content_type and content_type not in self.allowed_content_types:
-            return Response(
+        if content_type and content_type not in self._allowed_content_types:
+            response = Response(
                 content="Unsupported Media Type",
                 status_code=415
             )
+            await response(scope, receive, send)
+            return
         
         # 验证Content-Length
-        content_length = request.headers.get("content-length")
-        if content_length and int(content_length) > self.max_content_length:
-            return Response(
+        if content_length > self.max_content_length:
+            response = Response(
                 content="Request Entity Too Large",
                 status_code=413
             )
+            await response(scope, receive, send)
+            return
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 # 使用示例
 """
@@ -1,24 +1,118 @@
 # middlewares/security.py
+import json
+import string
 import time
 import re
-from typing import Callable, Optional
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from redis import Redis
+from collections import OrderedDict, deque
+from types import MappingProxyType
+import ahocorasick
+from typing import Optional
+from urllib.parse import unquote_plus
+from fastapi import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from redis.asyncio import Redis
 from app.utils.logger import get_logger
 from app.core.config import settings
 
 logger = get_logger()
 
-class RateLimitingMiddleware(BaseHTTPMiddleware):
+# 限流Lua脚本: 原子地累加当前窗口计数并设置过期时间，
+# 返回当前窗口计数与按比例加权的上一窗口计数之和
+# KEYS[1]: 当前窗口键  KEYS[2]: 上一窗口键
+# ARGV[1]: 过期时间(毫秒)  ARGV[2]: 上一窗口权重
+RATE_LIMIT_SCRIPT = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+return current + math.floor(previous * tonumber(ARGV[2]))
+"""
+
+# SQL注入检测模式
+# 模式在导入时编译一次并由所有实例共享，运行期不可修改；
+# 如需自定义检测规则，请继承SQLInjectionMiddleware并重写_check_sql_injection
+
+# SQL注释符号，直接使用子串查找，无需正则
+# (原 '.*?';\s*-- 模式必然包含"--"，已由此覆盖)
+SQL_INJECTION_TOKENS = ("--", "#", "/*", "*/")
+
+SQL_INJECTION_PATTERNS = (
+    r"(SELECT|INSERT|UPDATE|DELETE|DROP|UNION|ALTER).*?;",
+    r"(\b(AND|OR)\b\s+\w+\s*=\s*\w+)",
+    r"(\bEXEC\b|\bLIKE\b)",
+    r"(\bSYSTEM\b|\bUSER\b|\bDATABASE\b)",
+    r"\b(CONCAT|CHAR|ASCII)\b.*?\(",
+)
+
+# 合并为单个正则，一次扫描匹配所有模式
+SQL_INJECTION_PATTERN = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in SQL_INJECTION_PATTERNS),
+    re.IGNORECASE | re.DOTALL
+)
+
+# SQL注入关键字(小写)，任一模式命中都必须包含其中至少一个
+SQL_INJECTION_KEYWORDS = (
+    "select", "insert", "update", "delete", "drop", "union", "alter",
+    "and", "or", "exec", "like", "system", "user", "database",
+    "concat", "char", "ascii",
+)
+
+# 关键字匹配用的大小写归一化表，与 re.IGNORECASE 的等价关系一致：
+# 除ASCII大写字母外，sre 还将以下字符视为与ASCII字母等价
+# (str.lower/casefold 不会产生相同结果，不能替代)
+SQL_INJECTION_CASE_TABLE = str.maketrans({
+    **{c: c.lower() for c in string.ascii_uppercase},
+    "\u0130": "i",  # İ
+    "\u0131": "i",  # ı
+    "\u017f": "s",  # ſ
+    "\u212a": "k",  # K (开尔文符号)
+})
+
+# 关键字自动机，单次线性扫描完成预筛选
+SQL_INJECTION_AUTOMATON = ahocorasick.Automaton()
+for keyword in SQL_INJECTION_KEYWORDS:
+    SQL_INJECTION_AUTOMATON.add_word(keyword, keyword)
+SQL_INJECTION_AUTOMATON.make_automaton()
+
+# 安全响应头
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    "Content-Security-Policy": "default-src 'self'",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "geolocation=(), microphone=()",
+}
+
+def _replay_receive(
+    body: bytes,
+    receive: Receive,
+    more_body: bool = False
+) -> Receive:
+    """构造一个先回放已读取请求体、再委托原receive的receive"""
+    replayed = False
+    
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": more_body}
+        return await receive()
+    
+    return replay
+
+class RateLimitingMiddleware:
     """
     请求限流中间件
     
     功能：
     1. 基于IP的请求限流
     2. 支持不同路径不同限流规则
-    3. 支持Redis分布式限流
+    3. 支持Redis分布式限流(未传入redis_client时，若启用了REDIS_ENABLED
+       则使用app.state.redis_pool共享连接池，否则使用内存限流)
     4. 灵活的限流策略配置
     
     使用方法：
@@ -42,14 +136,44 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         rate_limit: int = 100,  # 默认每分钟请求数
         rate_limit_by_path: dict[str, int] | None = None,
         window_size: int = 60,  # 时间窗口(秒)
-        exclude_paths: set[str] | None = None
+        exclude_paths: set[str] | None = None,
+        max_memory_keys: int = 10000  # 内存限流最多跟踪的限流键数量
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.redis = redis_client
         self.rate_limit = rate_limit
-        self.rate_limit_by_path = rate_limit_by_path or {}
+        # 路径限流表构建后只读
+        self.rate_limit_by_path = MappingProxyType(dict(rate_limit_by_path or {}))
         self.window_size = window_size
-        self.exclude_paths = exclude_paths or {"/health", "/metrics"}
+        self.exclude_paths = frozenset(exclude_paths or {"/health", "/metrics"})
+        self.max_memory_keys = max_memory_keys
+        
+        # 内存限流记录(按最近使用排序，超出容量时淘汰最久未使用的键)
+        self._requests: OrderedDict[str, deque[float]] = OrderedDict()
+        
+        # redis_client需为redis.asyncio.Redis，避免阻塞事件循环
+        if self.redis:
+            self._register_script()
+        
+        # 预构建限流响应
+        self._rejected_body = b"Too Many Requests"
+        self._rejected_headers = [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(self._rejected_body)).encode()),
+            (b"retry-after", str(window_size).encode()),
+        ]
+    
+    def _register_script(self) -> None:
+        """注册限流脚本(调用时使用EVALSHA，脚本缓存丢失时自动重新加载)"""
+        self._rate_limit_script = self.redis.register_script(RATE_LIMIT_SCRIPT)
+    
+    def _resolve_redis(self, scope: Scope) -> None:
+        """未传入redis_client时，从应用共享连接池(如已启用)创建客户端"""
+        if self.redis is None:
+            pool = getattr(scope["app"].state, "redis_pool", None)
+            if pool is not None:
+                self.redis = Redis(connection_pool=pool)
+                self._register_script()
     
     def _get_rate_limit(self, path: str) -> int:
         """获取特定路径的限流值"""
@@ -61,50 +185,72 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         limit: int
     ) -> tuple[bool, int]:
         """检查是否超过限流"""
-        current_time = int(time.time())
-        window_start = current_time - self.window_size
-        
         if self.redis:
-            # 使用Redis进行分布式限流
-            pipeline = self.redis.pipeline()
-            pipeline.zremrangebyscore(key, 0, window_start)
-            pipeline.zadd(key, {str(current_time): current_time})
-            pipeline.zcard(key)
-            pipeline.expire(key, self.window_size)
-            _, _, count, _ = pipeline.execute()
+            # 使用Redis进行分布式限流(滑动窗口近似)
+            # 每个固定窗口一个计数器，上一窗口计数按剩余时间比例加权
+            current_time = int(time.time())
+            bucket, elapsed = divmod(current_time, self.window_size)
+            current_key = f"{key}:{bucket}"
+            previous_key = f"{key}:{bucket - 1}"
+            weight = (self.window_size - elapsed) / self.window_size
+            
+            # 计数器需在下一窗口中作为"上一窗口"继续使用，故保留两个窗口
+            count = await self._rate_limit_script(
+                keys=[current_key, previous_key],
+                args=[self.window_size * 2000, weight]
+            )
         else:
             # 内存限流(不推荐用于生产环境)
-            if not hasattr(self, '_requests'):
-                self._requests = {}
-            if key not in self._requests:
-                self._requests[key] = []
-                
-            self._requests[key] = [
-                ts for ts in self._requests[key] 
-                if ts > window_start
-            ]
-            self._requests[key].append(current_time)
-            count = len(self._requests[key])
+            # 使用单调时钟，避免系统时间调整影响窗口计算
+            current_time = time.monotonic()
+            window_start = current_time - self.window_size
+            
+            timestamps = self._requests.get(key)
+            if timestamps is None:
+                # 只需保留limit+1条记录即可判断是否超限
+                timestamps = self._requests[key] = deque(maxlen=limit + 1)
+                if len(self._requests) > self.max_memory_keys:
+                    self._requests.popitem(last=False)
+            else:
+                self._requests.move_to_end(key)
+            
+            # 移除窗口外的记录
+            while timestamps and timestamps[0] <= window_start:
+                timestamps.popleft()
+            timestamps.append(current_time)
+            count = len(timestamps)
             
         return count <= limit, count
     
-    async def dispatch(
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        path = scope["path"]
+        
         # 检查是否需要跳过限流
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
+        if path in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        self._resolve_redis(scope)
         
         # 获取客户端IP
-        client_ip = request.client.host if request.client else "unknown"
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
         
         # 获取当前路径的限流值
-        rate_limit = self._get_rate_limit(request.url.path)
+        rate_limit = self._get_rate_limit(path)
         
         # 限流键(可以基于IP、路径等组合)
-        rate_limit_key = f"rate_limit:{client_ip}:{request.url.path}"
+        # 使用IP作为hash tag，保证同一客户端的所有限流键位于同一集群槽位
+        rate_limit_key = f"rl:{{{client_ip}}}:{path}"
         
         # 检查限流
         is_allowed, current_count = await self._check_rate_limit(
@@ -117,20 +263,25 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
                 "Rate limit exceeded",
                 extra={
                     "client_ip": client_ip,
-                    "path": request.url.path,
+                    "path": path,
                     "count": current_count,
                     "limit": rate_limit
                 }
             )
-            return Response(
-                content="Too Many Requests",
-                status_code=429,
-                headers={"Retry-After": str(self.window_size)}
-            )
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": self._rejected_headers,
+            })
+            await send({
+                "type": "http.response.body",
+                "body": self._rejected_body,
+            })
+            return
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """
     安全响应头中间件
     
@@ -148,25 +299,30 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     app.add_middleware(SecurityHeadersMiddleware)
     ```
     """
-    async def dispatch(
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
-        response = await call_next(request)
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # 添加安全响应头
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=()"
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # 添加安全响应头
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_wrapper)
 
-class SQLInjectionMiddleware(BaseHTTPMiddleware):
+class SQLInjectionMiddleware:
     """
     SQL注入防护中间件
     
@@ -182,85 +338,146 @@ class SQLInjectionMiddleware(BaseHTTPMiddleware):
     app = FastAPI()
     app.add_middleware(
         SQLInjectionMiddleware,
-        block_suspicious=True  # 阻止可疑请求
+        block_suspicious=True,  # 阻止可疑请求
+        max_scan_bytes=1 << 20  # 超过1MB的请求体不检查
     )
     ```
     """
     def __init__(
         self,
         app: ASGIApp,
-        block_suspicious: bool = True
+        block_suspicious: bool = True,
+        max_scan_bytes: int = 1 << 20
     ) -> None:
-        super().__init__(app)
+        self.app = app
         self.block_suspicious = block_suspicious
-        
-        # SQL注入检测模式
-        self.sql_patterns = [
-            r"(?i)(SELECT|INSERT|UPDATE|DELETE|DROP|UNION|ALTER).*?;",
-            r"(?i)(\b(AND|OR)\b\s+\w+\s*=\s*\w+)",
-            r"(?i)(--|\#|\/\*|\*\/)",
-            r"(?i)(\bEXEC\b|\bLIKE\b)",
-            r"(?i)(\bSYSTEM\b|\bUSER\b|\bDATABASE\b)",
-            r"'.*?';\s*--",
-            r"\b(CONCAT|CHAR|ASCII)\b.*?\(",
-        ]
-        
-        # 编译正则表达式
-        self.patterns = [re.compile(pattern) for pattern in self.sql_patterns]
+        self.max_scan_bytes = max_scan_bytes
     
     def _check_sql_injection(self, text: str) -> bool:
         """检查是否包含SQL注入模式"""
-        return any(pattern.search(text) for pattern in self.patterns)
+        if any(token in text for token in SQL_INJECTION_TOKENS):
+            return True
+        # 未命中任何关键字时无需执行正则
+        if text.isascii():
+            normalized = text.lower()
+        else:
+            normalized = text.translate(SQL_INJECTION_CASE_TABLE)
+        if next(SQL_INJECTION_AUTOMATON.iter(normalized), None) is None:
+            return False
+        return SQL_INJECTION_PATTERN.search(text) is not None
     
-    async def _get_request_data(self, request: Request) -> dict:
-        """获取请求数据"""
-        data = {
-            "query_params": str(request.query_params),
-            "path_params": str(request.path_params),
-        }
+    def _should_scan_body(self, scope: Scope) -> bool:
+        """判断是否需要检查请求体(仅检查不超过大小上限的JSON请求体)"""
+        if scope["method"] not in ("POST", "PUT", "PATCH"):
+            return False
+        
+        is_json = False
+        content_length = 0
+        for name, value in scope["headers"]:
+            if name == b"content-type":
+                is_json = value.split(b";", 1)[0].strip().lower() == b"application/json"
+            elif name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
         
-        # 检查请求体
-        if request.method in ["POST", "PUT", "PATCH"]:
+        if is_json and content_length > self.max_scan_bytes:
+            logger.info(
+                "Request body too large, skipping SQL injection scan",
+                extra={
+                    "path": scope["path"],
+                    "content_length": content_length,
+                    "max_scan_bytes": self.max_scan_bytes
+                }
+            )
+            return False
+        return is_json
+    
+    def _decode_body(self, body: bytes) -> str:
+        """获取待检查的请求体文本"""
+        # 含转义序列(如\u004f)时需按解析后的值检查，否则可绕过检测
+        if b"\\" in body:
             try:
-                body = await request.json()
-                data["body"] = str(body)
-            except:
+                return str(json.loads(body))
+            except (ValueError, RecursionError):
                 pass
-                
-        return data
+        return body.decode("utf-8", "ignore")
     
-    async def dispatch(
+    async def _read_body(self, receive: Receive) -> tuple[bytes, bool]:
+        """读取请求体，超过大小上限时停止读取并返回剩余部分是否未读"""
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body and size <= self.max_scan_bytes:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            more_body = message.get("more_body", False)
+        return b"".join(chunks), more_body
+    
+    async def __call__(
         self,
-        request: Request,
-        call_next: Callable
-    ) -> Response:
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        query_string = scope["query_string"]
+        scan_body = self._should_scan_body(scope)
+        
+        # 无查询参数且无需检查请求体时(如普通GET/HEAD/OPTIONS)直接放行
+        if not query_string and not scan_body:
+            await self.app(scope, receive, send)
+            return
+        
         # 获取请求数据
-        request_data = await self._get_request_data(request)
+        request_data = {}
+        if query_string:
+            request_data["query_params"] = unquote_plus(query_string.decode("latin-1"))
+        
+        # 检查请求体: 直接扫描原始字节，并将其回放给下游
+        if scan_body:
+            body, more_body = await self._read_body(receive)
+            # 未声明长度的请求体超过上限时不检查
+            if not more_body:
+                request_data["body"] = self._decode_body(body)
+            receive = _replay_receive(body, receive, more_body)
         
         # 检查所有数据是否包含SQL注入
         for key, value in request_data.items():
             if self._check_sql_injection(value):
+                client = scope.get("client")
                 logger.warning(
                     "Potential SQL injection detected",
                     extra={
-                        "client_ip": request.client.host,
-                        "path": request.url.path,
-                        "method": request.method,
+                        "client_ip": client[0] if client else "unknown",
+                        "path": scope["path"],
+                        "method": scope["method"],
                         "suspicious_data": {key: value}
                     }
                 )
                 
                 if self.block_suspicious:
-                    return Response(
+                    response = Response(
                         content="Invalid request",
                         status_code=400
                     )
+                    await response(scope, receive, send)
+                    return
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 # 使用示例
 """
 from fastapi import FastAPI
+from redis.asyncio import Redis
 from app.middlewares.security import (
     RateLimitingMiddleware,
     SecurityHeadersMiddleware,
@@ -268,6 +485,7 @@ from app.middlewares.security import (
 )
 
 app = FastAPI()
+redis_client = Redis(host="localhost", port=6379)  # 需使用异步客户端
 
 # 添加中间件（注意顺序）
 app.add_middleware(SecurityHeadersMiddleware)
@@ -1,7 +1,8 @@
 # core/config.py
+from functools import cached_property, lru_cache
 from typing import List, Optional
 from pydantic_settings import BaseSettings
-from pydantic import AnyHttpUrl, field_validator
+from pydantic import AnyHttpUrl, computed_field, field_validator
 import secrets
 
 class Settings(BaseSettings):
@@ -18,9 +19,11 @@ class Settings(BaseSettings):
     WORKERS: int = 1
     
     # 安全配置
+    # 默认值在导入时随机生成，重启后已签发的令牌失效；生产环境应通过环境变量设置
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 30  # 30 days
+    ACCESS_BCRYPT_ROUNDS: int = 12  # bcrypt计算轮数，测试/开发环境可设为4以加快速度
     
     # CORS配置
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -39,21 +42,37 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "postgres"
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "app"
+    
+    # 数据库连接池配置
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # 获取连接超时(秒)
+    DB_POOL_RECYCLE: int = 1800  # 连接回收时间(秒)
+    DB_STATEMENT_CACHE_SIZE: int = 1024  # asyncpg预处理语句缓存大小
+    DB_ECHO: bool = False  # 是否输出SQL日志(影响性能，仅调试时开启)
 
-    @property
+    @computed_field
+    @cached_property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@" \
             f"{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
-    # Redis配置
+    # Redis配置(可选，启用后在启动时创建共享连接池)
+    REDIS_ENABLED: bool = False
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[str] = None
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 64
     
     class Config:
         case_sensitive = True
         env_file = ".env"
 
+@lru_cache
+def get_settings() -> Settings:
+    """获取设置实例(仅在首次调用时读取环境变量和.env文件)"""
+    return Settings()
+
 # 创建设置实例
-settings = Settings()
\ No newline at end of file
+settings = get_settings()
\ No newline at end of file
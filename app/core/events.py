@@ -1,25 +1,61 @@
 # core/events.py
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import suppress
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from redis.asyncio import ConnectionPool
 
 from app.core.config import settings
 from app.api.router import router
+from app.api.middlewares.exception import consume_alerts
+from app.api.middlewares.health import HealthCheckMiddleware
+from app.utils.logger import get_logger
 
-async def startup_handler() -> None:
+logger = get_logger()
+
+# 预序列化的通用500响应体
+_INTERNAL_ERROR_BODY = (
+    b'{"message":"Internal Server Error","detail":"An error occurred"}'
+)
+
+async def startup_handler(app: FastAPI) -> None:
     """
     应用启动时的处理函数
     """
     # 数据库连接初始化等操作
-    pass
+    
+    # Redis共享连接池(连接按需建立，供各中间件/组件复用)
+    # 未启用Redis时不创建，限流等组件使用内存实现
+    if settings.REDIS_ENABLED:
+        app.state.redis_pool = ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+    
+    # 错误告警队列及后台消费任务
+    app.state.alert_queue = asyncio.Queue(maxsize=1000)
+    app.state.alert_consumer = asyncio.create_task(
+        consume_alerts(app.state.alert_queue)
+    )
 
-async def shutdown_handler() -> None:
+async def shutdown_handler(app: FastAPI) -> None:
     """
     应用关闭时的处理函数
     """
     # 清理资源等操作
-    pass
+    app.state.alert_consumer.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.alert_consumer
+    
+    redis_pool = getattr(app.state, "redis_pool", None)
+    if redis_pool is not None:
+        await redis_pool.disconnect()
 
 def configure_middleware(app: FastAPI) -> None:
     """
@@ -39,6 +75,9 @@ def configure_middleware(app: FastAPI) -> None:
         TrustedHostMiddleware, 
         allowed_hosts=["*"]  # 生产环境需要配置具体的允许域名
     )
+    
+    # 健康检查中间件(最外层，探针请求不进入其他中间件)
+    app.add_middleware(HealthCheckMiddleware)
 
 def configure_routers(app: FastAPI) -> None:
     """
@@ -54,10 +93,20 @@ def configure_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(Exception)
     async def global_exception_handler(request: Request, exc: Exception):
         # 全局异常处理
+        logger.opt(exception=exc).error(
+            f"Unhandled exception: {request.method} {request.url.path}"
+        )
+        
+        if not settings.DEBUG:
+            return Response(
+                content=_INTERNAL_ERROR_BODY,
+                status_code=500,
+                media_type="application/json"
+            )
         return JSONResponse(
             status_code=500,
             content={
                 "message": "Internal Server Error",
-                "detail": str(exc) if settings.DEBUG else "An error occurred"
+                "detail": str(exc)
             }
         )
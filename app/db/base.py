@@ -1,7 +1,7 @@
 # db/base.py
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer
+from sqlalchemy import DateTime, Integer, func
 from datetime import datetime
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -9,8 +9,15 @@ class Base(AsyncAttrs, DeclarativeBase):
     SQLAlchemy 基础模型类
     """
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    # 时间戳由数据库生成
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
     updated_at: Mapped[datetime] = mapped_column(
-        default=datetime.now,
-        onupdate=datetime.now
-    )
\ No newline at end of file
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
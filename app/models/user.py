@@ -1,5 +1,5 @@
 # models/user.py
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db.base import Base
 
@@ -7,10 +7,9 @@ class User(Base):
     """用户数据库模型"""
     __tablename__ = "users"
     
+    # 邮箱唯一性及查询由下方不区分大小写的函数索引保证
     email: Mapped[str] = mapped_column(
         String(254), 
-        unique=True, 
-        index=True,
         nullable=False
     )
     username: Mapped[str] = mapped_column(
@@ -34,5 +33,9 @@ class User(Base):
         nullable=False
     )
 
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
+
     def __repr__(self) -> str:
         return f"<User {self.email}>"
\ No newline at end of file
@@ -9,33 +9,29 @@ class Token(BaseModel):
     """
     access_token: str = Field(
         ...,
-        description="访问令牌",
-        example="eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.xxx"
+        description="访问令牌"
     )
     refresh_token: str = Field(
         ..., 
-        description="刷新令牌",
-        example="eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.yyy"
+        description="刷新令牌"
     )
     token_type: str = Field(
         default="bearer",
-        description="令牌类型",
-        example="bearer"
+        description="令牌类型"
     )
     expires_in: int = Field(
         ...,
-        description="访问令牌过期时间(秒)",
-        example=3600
+        description="访问令牌过期时间(秒)"
     )
 
     model_config = ConfigDict(
         json_schema_extra={
-            "example": {
+            "examples": [{
                 "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.xxx",
                 "refresh_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.yyy", 
                 "token_type": "bearer",
                 "expires_in": 3600
-            }
+            }]
         }
     )
 
@@ -45,33 +41,40 @@ class TokenPayload(BaseModel):
     """
     sub: str | int = Field(
         ...,
-        description="主题(通常是用户ID)",
-        example="123"
+        description="主题(通常是用户ID)"
     )
     exp: datetime = Field(
         ...,
-        description="过期时间",
-        example="2024-12-31T23:59:59"
+        description="过期时间"
     )
     iat: Optional[datetime] = Field(
         default=None,
-        description="签发时间",
-        example="2024-01-01T00:00:00"
+        description="签发时间"
     )
     type: str = Field(
         default="access",
-        description="令牌类型(access或refresh)",
-        example="access"
+        description="令牌类型(access或refresh)"
     )
     jti: Optional[str] = Field(
         default=None,
-        description="JWT ID",
-        example="unique-jwt-id-123"
+        description="JWT ID"
     )
     
-    model_config = ConfigDict(json_encoders={
-        datetime: lambda v: v.timestamp()
-    })
+    model_config = ConfigDict(
+        frozen=True,
+        json_encoders={
+            datetime: lambda v: v.timestamp()
+        },
+        json_schema_extra={
+            "examples": [{
+                "sub": "123",
+                "exp": "2024-12-31T23:59:59",
+                "iat": "2024-01-01T00:00:00",
+                "type": "access",
+                "jti": "unique-jwt-id-123"
+            }]
+        }
+    )
 
 class RefreshToken(BaseModel):
     """
@@ -80,15 +83,14 @@ class RefreshToken(BaseModel):
     refresh_token: str = Field(
         ...,
         description="刷新令牌",
-        min_length=1,
-        example="eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.yyy"
+        min_length=1
     )
     
     model_config = ConfigDict(
         json_schema_extra={
-            "example": {
+            "examples": [{
                 "refresh_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.yyy"
-            }
+            }]
         }
     )
 
@@ -98,18 +100,15 @@ class TokenBlacklist(BaseModel):
     """
     jti: str = Field(
         ...,
-        description="JWT ID",
-        example="unique-jwt-id-123"
+        description="JWT ID"
     )
     exp: datetime = Field(
         ...,
-        description="过期时间",
-        example="2024-12-31T23:59:59"
+        description="过期时间"
     )
     type: str = Field(
         ...,
-        description="令牌类型",
-        example="access"
+        description="令牌类型"
     )
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
@@ -118,12 +117,12 @@ class TokenBlacklist(BaseModel):
     
     model_config = ConfigDict(
         json_schema_extra={
-            "example": {
+            "examples": [{
                 "jti": "unique-jwt-id-123",
                 "exp": "2024-12-31T23:59:59",
                 "type": "access",
                 "created_at": "2024-01-01T00:00:00"
-            }
+            }]
         }
     )
 
@@ -133,27 +132,34 @@ class TokenMetadata(BaseModel):
     """
     user_id: int = Field(
         ...,
-        description="用户ID",
-        example=123
+        description="用户ID"
     )
     device_id: Optional[str] = Field(
         default=None,
-        description="设备ID",
-        example="device-123"
+        description="设备ID"
     )
     ip_address: Optional[str] = Field(
         default=None,
-        description="IP地址",
-        example="192.168.1.1"
+        description="IP地址"
     )
     user_agent: Optional[str] = Field(
         default=None,
-        description="User Agent",
-        example="Mozilla/5.0 ..."
+        description="User Agent"
     )
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
         description="创建时间"
     )
     
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_schema_extra={
+            "examples": [{
+                "user_id": 123,
+                "device_id": "device-123",
+                "ip_address": "192.168.1.1",
+                "user_agent": "Mozilla/5.0 ...",
+                "created_at": "2024-01-01T00:00:00"
+            }]
+        }
+    )
\ No newline at end of file
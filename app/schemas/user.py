@@ -13,12 +13,12 @@ class UserBase(BaseModel):
     model_config = ConfigDict(
         from_attributes=True,
         json_schema_extra={
-            "example": {
+            "examples": [{
                 "email": "user@example.com",
                 "username": "johndoe",
                 "is_active": True,
                 "is_superuser": False
-            }
+            }]
         }
     )
 
@@ -36,11 +36,13 @@ class UserUpdate(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 class UserInDB(UserBase):
-    """数据库用户模型"""
+    """数据库用户模型(不可变快照，与数据库会话无关)"""
     id: int
     hashed_password: str
     created_at: datetime
     updated_at: datetime
+    
+    model_config = ConfigDict(frozen=True)
 
 class UserResponse(UserBase):
     """用户响应模型"""
@@ -1,13 +1,18 @@
 # services/auth.py
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from jose import jwt
+import jwt
 
 from app.core.config import settings
-from app.core.security import verify_password, get_password_hash
+from app.utils.security import (
+    DUMMY_PASSWORD_HASH,
+    verify_password,
+    get_password_hash
+)
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
@@ -21,13 +26,18 @@ class AuthService:
         db: AsyncSession
     ) -> Optional[User]:
         """验证用户"""
-        query = select(User).where(User.email == email)
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
+        user = await AuthService.get_user_by_email(email, db)
         
         if not user:
+            # 仍执行一次密码校验，避免通过响应时间枚举用户
+            await asyncio.to_thread(
+                verify_password, password, DUMMY_PASSWORD_HASH
+            )
             return None
-        if not verify_password(password, user.hashed_password):
+        # bcrypt计算耗时较长，放到线程中执行以免阻塞事件循环
+        if not await asyncio.to_thread(
+            verify_password, password, user.hashed_password
+        ):
             return None
         return user
 
@@ -78,10 +88,10 @@ class AuthService:
         email: str,
         db: AsyncSession
     ) -> Optional[User]:
-        """通过邮箱获取用户"""
-        query = select(User).where(User.email == email)
-        result = await db.execute(query)
-        return result.scalar_one_or_none()
+        """通过邮箱获取用户(不区分大小写)"""
+        return await db.scalar(
+            select(User).where(func.lower(User.email) == email.lower())
+        )
 
     @staticmethod
     async def create_user(
@@ -101,15 +111,19 @@ class AuthService:
             )
         
         # 创建新用户
+        hashed_password = await asyncio.to_thread(
+            get_password_hash, user_create.password
+        )
         db_user = User(
             email=user_create.email,
             username=user_create.username,
-            hashed_password=get_password_hash(user_create.password),
+            hashed_password=hashed_password,
             is_active=user_create.is_active,
             is_superuser=user_create.is_superuser
         )
         db.add(db_user)
-        await db.commit()
+        # 只刷新不提交，由调用方(端点)在返回响应前提交
+        await db.flush()
         await db.refresh(db_user)
         return db_user
 
@@ -128,13 +142,14 @@ class AuthService:
         # 更新用户信息
         update_data = user_update.model_dump(exclude_unset=True)
         if "password" in update_data:
-            update_data["hashed_password"] = get_password_hash(
-                update_data.pop("password")
+            update_data["hashed_password"] = await asyncio.to_thread(
+                get_password_hash, update_data.pop("password")
             )
             
         for field, value in update_data.items():
             setattr(user, field, value)
             
-        await db.commit()
+        # 只刷新不提交，由调用方(端点)在返回响应前提交
+        await db.flush()
         await db.refresh(user)
         return user
@@ -0,0 +1,82 @@
+# tests/conftest.py
+import os
+
+# 降低bcrypt计算轮数以加快测试(需在导入应用配置之前设置)
+os.environ.setdefault("ACCESS_BCRYPT_ROUNDS", "4")
+
+from typing import AsyncGenerator
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine
+)
+from sqlalchemy.pool import NullPool
+
+from app import app
+from app.api import deps
+from app.db.base import Base
+from app.models.user import User  # noqa: F401 注册users表
+from app.services.auth import AuthService
+
+TEST_EMAIL = "user@example.com"
+TEST_USERNAME = "johndoe"
+TEST_PASSWORD = "password123"
+
+@pytest_asyncio.fixture
+async def engine(tmp_path) -> AsyncGenerator[AsyncEngine, None]:
+    """基于临时文件的SQLite引擎(每个连接独立，可观察事务提交情况)"""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}",
+        poolclass=NullPool
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+@pytest_asyncio.fixture
+async def session_factory(
+    engine: AsyncEngine,
+    monkeypatch
+) -> async_sessionmaker[AsyncSession]:
+    """替换 get_db 使用的会话工厂，并清空用户缓存"""
+    factory = async_sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autoflush=False,
+    )
+    monkeypatch.setattr(deps, "async_session", factory)
+    deps._user_cache.clear()
+    yield factory
+    deps._user_cache.clear()
+
+@pytest_asyncio.fixture
+async def client(
+    session_factory: async_sessionmaker[AsyncSession]
+) -> AsyncGenerator[AsyncClient, None]:
+    """测试客户端"""
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test"
+    ) as client:
+        yield client
+
+@pytest_asyncio.fixture
+async def auth_headers(client: AsyncClient) -> dict[str, str]:
+    """注册测试用户并返回携带访问令牌的请求头"""
+    response = await client.post(
+        "/api/users/register",
+        json={
+            "email": TEST_EMAIL,
+            "username": TEST_USERNAME,
+            "password": TEST_PASSWORD
+        }
+    )
+    assert response.status_code == 200, response.text
+
+    access_token = AuthService.create_access_token(response.json()["id"])
+    return {"Authorization": f"Bearer {access_token}"}
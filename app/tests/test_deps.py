@@ -0,0 +1,70 @@
+# tests/test_deps.py
+from datetime import datetime, timedelta, timezone
+import jwt
+import pytest
+
+from app.api import deps
+from app.schemas.token import TokenPayload
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    deps._token_cache.clear()
+    yield
+    deps._token_cache.clear()
+
+def _make_token(expires_in: timedelta, key: str | bytes = deps._JWT_KEY) -> str:
+    expire = datetime.now(timezone.utc) + expires_in
+    return jwt.encode({"sub": "1", "exp": expire}, key, algorithm="HS256")
+
+def test_decode_token_cache_hit_skips_jwt_decode(monkeypatch):
+    """同一令牌第二次解码命中缓存，不再校验签名"""
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(deps.jwt, "decode", counting_decode)
+    token = _make_token(timedelta(minutes=5))
+
+    first = deps.decode_token(token)
+    second = deps.decode_token(token)
+    assert first is second
+    assert first.sub == "1"
+    assert len(calls) == 1
+
+def test_decode_token_does_not_cache_bad_signature():
+    """签名无效的令牌不会被缓存"""
+    token = _make_token(timedelta(minutes=5), key=b"wrong-key")
+
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidTokenError):
+            deps.decode_token(token)
+    assert len(deps._token_cache) == 0
+
+def test_token_cache_entry_expires_at_token_exp_or_max_ttl():
+    """缓存条目在令牌过期时间与最长存活时间中较早者失效"""
+    now = 1_700_000_000.0
+    soon = TokenPayload(sub="1", exp=datetime.fromtimestamp(now + 60, timezone.utc))
+    later = TokenPayload(sub="1", exp=datetime.fromtimestamp(now + 3600, timezone.utc))
+
+    assert deps._token_ttu(b"", soon, now) == now + 60
+    assert deps._token_ttu(b"", later, now) == now + deps.TOKEN_CACHE_MAX_TTL
+
+def test_token_cache_drops_expired_entry(monkeypatch):
+    """缓存条目到期后重新校验令牌"""
+    clock = [1_700_000_000.0]
+    monkeypatch.setattr(
+        deps,
+        "_token_cache",
+        deps.TLRUCache(maxsize=10, ttu=deps._token_ttu, timer=lambda: clock[0])
+    )
+    token = _make_token(timedelta(hours=1))
+    payload = deps.decode_token(token)
+    key = next(iter(deps._token_cache.keys()))
+
+    clock[0] += deps.TOKEN_CACHE_MAX_TTL - 1
+    assert deps._token_cache.get(key) is payload
+    clock[0] += 1
+    assert deps._token_cache.get(key) is None
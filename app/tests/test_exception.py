@@ -0,0 +1,69 @@
+# tests/test_exception.py
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+from app.api.middlewares import exception
+from app.api.middlewares.exception import ErrorLoggingMiddleware, consume_alerts
+
+@pytest.fixture
+def sent_batches(monkeypatch) -> list[list[dict]]:
+    """替换告警发送函数，记录每次发送的批次"""
+    batches = []
+
+    async def fake_send_alerts(alerts: list[dict]) -> None:
+        batches.append(alerts)
+
+    monkeypatch.setattr(exception, "send_alerts", fake_send_alerts)
+    return batches
+
+async def _run_consumer(queue: asyncio.Queue, seconds: float) -> None:
+    consumer = asyncio.create_task(consume_alerts(queue))
+    await asyncio.sleep(seconds)
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+
+@pytest.mark.asyncio
+async def test_consume_alerts_sends_full_batches(sent_batches, monkeypatch):
+    """累计达到 ALERT_BATCH_SIZE 条时合并为一次发送"""
+    monkeypatch.setattr(exception, "ALERT_BATCH_SIZE", 3)
+    monkeypatch.setattr(exception, "ALERT_BATCH_TIMEOUT", 60.0)
+    queue = asyncio.Queue()
+    for i in range(7):
+        queue.put_nowait({"n": i})
+
+    await _run_consumer(queue, 0.05)
+
+    assert [[a["n"] for a in batch] for batch in sent_batches] == [
+        [0, 1, 2],
+        [3, 4, 5],
+    ]
+
+@pytest.mark.asyncio
+async def test_consume_alerts_flushes_partial_batch_after_timeout(
+    sent_batches,
+    monkeypatch
+):
+    """未满一批时等待 ALERT_BATCH_TIMEOUT 后发送已累计的告警"""
+    monkeypatch.setattr(exception, "ALERT_BATCH_TIMEOUT", 0.05)
+    queue = asyncio.Queue()
+    queue.put_nowait({"n": 0})
+    queue.put_nowait({"n": 1})
+
+    await _run_consumer(queue, 0.2)
+
+    assert sent_batches == [[{"n": 0}, {"n": 1}]]
+
+def test_dispatch_alert_drops_when_queue_full():
+    """告警队列已满时丢弃新告警，不阻塞也不抛出异常"""
+    queue = asyncio.Queue(maxsize=1)
+    scope = {"app": SimpleNamespace(state=SimpleNamespace(alert_queue=queue))}
+    middleware = ErrorLoggingMiddleware(None)
+
+    middleware._dispatch_alert(scope, {"n": 0})
+    middleware._dispatch_alert(scope, {"n": 1})
+
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == {"n": 0}
+    assert not middleware._alert_tasks
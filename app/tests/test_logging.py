@@ -0,0 +1,37 @@
+# tests/test_logging.py
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from loguru import logger
+
+from app.api.middlewares.logging import RequestLoggingMiddleware
+
+@pytest.fixture
+def log_messages() -> list[str]:
+    """临时添加loguru处理器，记录日志消息"""
+    messages = []
+    handler_id = logger.add(lambda m: messages.append(m.record["message"]))
+    yield messages
+    logger.remove(handler_id)
+
+@pytest.mark.asyncio
+async def test_slow_request_is_logged_without_request_id(log_messages):
+    """未挂载 ResponseMiddleware 时仍记录慢请求，仅跳过请求/响应日志"""
+    app = FastAPI()
+    app.add_middleware(RequestLoggingMiddleware, slow_request_threshold=0)
+
+    @app.get("/x")
+    async def x() -> dict:
+        return {}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test"
+    ) as client:
+        response = await client.get("/x")
+
+    assert response.status_code == 200
+    assert "X-Process-Time" in response.headers
+    assert "Slow request detected" in log_messages
+    assert not any(m.startswith("Request received") for m in log_messages)
+    assert "Request completed" not in log_messages
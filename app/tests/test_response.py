@@ -0,0 +1,30 @@
+# tests/test_response.py
+import os
+import pytest
+
+from app.api.middlewares import response
+from app.api.middlewares.response import generate_request_id
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 os.fork")
+def test_request_id_prefix_is_reset_in_forked_child():
+    """fork出的子进程使用自己的前缀并从头计数，不与父进程重复"""
+    parent_id = generate_request_id()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            os.write(write_fd, generate_request_id().encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        child_id = f.read().decode()
+    os.waitpid(pid, 0)
+
+    child_prefix, child_seq = child_id.split("-")
+    assert child_prefix.startswith(f"{pid:x}")
+    assert child_seq == "0"
+    assert not child_id.startswith(response._REQUEST_ID_PREFIX)
+    assert parent_id.startswith(response._REQUEST_ID_PREFIX)
@@ -0,0 +1,199 @@
+# tests/test_security.py
+import re
+import sys
+from contextlib import asynccontextmanager
+import pytest
+from asgi_lifespan import LifespanManager
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+from app.api.middlewares.security import (
+    SQL_INJECTION_CASE_TABLE,
+    SQL_INJECTION_PATTERN,
+    RateLimitingMiddleware,
+    SQLInjectionMiddleware
+)
+from app.core.events import startup_handler, shutdown_handler
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_handler(app)
+    yield
+    await shutdown_handler(app)
+
+@pytest.mark.asyncio
+async def test_rate_limit_falls_back_to_memory_without_redis():
+    """未启用Redis时，未传入redis_client的限流中间件使用内存限流"""
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(RateLimitingMiddleware, rate_limit=3)
+
+    @app.get("/x")
+    async def x() -> dict:
+        return {}
+
+    async with LifespanManager(app) as manager:
+        assert not hasattr(app.state, "redis_pool")
+        async with AsyncClient(
+            transport=ASGITransport(app=manager.app),
+            base_url="http://test"
+        ) as client:
+            status_codes = [
+                (await client.get("/x")).status_code for _ in range(4)
+            ]
+
+    assert status_codes == [200, 200, 200, 429]
+
+def _sql_injection_client(**kwargs) -> AsyncClient:
+    """构造挂载了SQL注入中间件、回显请求体的测试客户端"""
+    app = FastAPI()
+    app.add_middleware(SQLInjectionMiddleware, **kwargs)
+
+    @app.post("/echo")
+    async def echo(request: Request) -> dict:
+        return {"body": (await request.body()).decode()}
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_sql_injection_scans_body_and_replays_it_intact():
+    """上限以内的请求体被检查，且下游仍能读取完整请求体"""
+    body = '{"name": "bob", "bio": "hello world"}'
+    async with _sql_injection_client() as client:
+        response = await client.post(
+            "/echo",
+            content=body,
+            headers={"content-type": "application/json"}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"body": body}
+
+        response = await client.post(
+            "/echo",
+            json={"q": "1 OR 1=1"}
+        )
+        assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_sql_injection_blocks_json_escaped_payload():
+    """JSON转义(\\uXXXX)的注入内容按解析后的值检查"""
+    async with _sql_injection_client() as client:
+        response = await client.post(
+            "/echo",
+            content=b'{"q": "1 \\u004fR 1=1"}',
+            headers={"content-type": "application/json"}
+        )
+    assert response.status_code == 400
+
+def test_sql_injection_case_table_matches_re_ignorecase():
+    """归一化表覆盖 re.IGNORECASE 下与ASCII字母等价的所有字符"""
+    chars = "".join(map(chr, (
+        *range(0x80, 0xD800),
+        *range(0xE000, sys.maxunicode + 1)
+    )))
+    expected = {}
+    for char in set(re.findall("[a-z]", chars, re.IGNORECASE)):
+        for letter in "abcdefghijklmnopqrstuvwxyz":
+            if re.fullmatch(letter, char, re.IGNORECASE):
+                expected[ord(char)] = letter
+    non_ascii = {k: v for k, v in SQL_INJECTION_CASE_TABLE.items() if k >= 0x80}
+    assert non_ascii == expected
+
+@pytest.mark.parametrize("text", [
+    "x lıke y",
+    "x lİke y",
+    "x li\u212ae y",
+    "ſelect 1;",
+    "SELECT 1;",
+    "dro\u0440 table;",
+    "Straße",
+    "hello world",
+])
+def test_sql_injection_prefilter_agrees_with_pattern(text):
+    """关键字预筛选不改变正则的检测结果"""
+    middleware = SQLInjectionMiddleware(None)
+    expected = SQL_INJECTION_PATTERN.search(text) is not None
+    assert middleware._check_sql_injection(text) is expected
+
+@pytest.mark.asyncio
+async def test_sql_injection_skips_scan_over_declared_content_length():
+    """声明的Content-Length超过上限时不检查请求体"""
+    async with _sql_injection_client(max_scan_bytes=8) as client:
+        response = await client.post("/echo", json={"q": "1 OR 1=1"})
+    assert response.status_code == 200
+    assert response.json() == {"body": '{"q":"1 OR 1=1"}'}
+
+@pytest.mark.asyncio
+async def test_sql_injection_streams_oversized_body_without_content_length():
+    """未声明长度的请求体超过上限时不检查，且完整转发给下游"""
+    chunks = [b'{"a": "0123456789', b'", "q": "drop x;', b'"}']
+    messages = iter(
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    )
+    received = []
+
+    async def receive():
+        return next(messages)
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            received.append(message["body"])
+            if not message["more_body"]:
+                break
+
+    middleware = SQLInjectionMiddleware(app, max_scan_bytes=10)
+    await middleware(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/echo",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/json")],
+        },
+        receive,
+        None
+    )
+    assert b"".join(received) == b"".join(chunks)
+
+@pytest.mark.asyncio
+async def test_memory_rate_limit_evicts_least_recently_used_key():
+    """内存限流超过 max_memory_keys 时淘汰最久未使用的键"""
+    middleware = RateLimitingMiddleware(None, rate_limit=1, max_memory_keys=2)
+
+    assert await middleware._check_rate_limit("a", 1) == (True, 1)
+    assert await middleware._check_rate_limit("b", 1) == (True, 1)
+    # 访问a使其成为最近使用的键，随后新增c时淘汰b
+    assert await middleware._check_rate_limit("a", 1) == (False, 2)
+    assert await middleware._check_rate_limit("c", 1) == (True, 1)
+
+    assert list(middleware._requests) == ["a", "c"]
+    assert await middleware._check_rate_limit("b", 1) == (True, 1)
+
+@pytest.mark.asyncio
+async def test_memory_rate_limit_uses_per_path_limit():
+    """不同路径使用各自的限流值，超限后返回429"""
+    app = FastAPI()
+    app.add_middleware(
+        RateLimitingMiddleware,
+        rate_limit=3,
+        rate_limit_by_path={"/login": 1}
+    )
+
+    @app.get("/x")
+    async def x() -> dict:
+        return {}
+
+    @app.get("/login")
+    async def login() -> dict:
+        return {}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test"
+    ) as client:
+        login_codes = [(await client.get("/login")).status_code for _ in range(2)]
+        other_codes = [(await client.get("/x")).status_code for _ in range(4)]
+
+    assert login_codes == [200, 429]
+    assert other_codes == [200, 200, 200, 429]
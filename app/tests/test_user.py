@@ -0,0 +1,130 @@
+# tests/test_user.py
+import pytest
+from httpx import ASGITransport, AsyncClient
+from pydantic import ValidationError
+from sqlalchemy import event, select
+
+from app import app
+from app.api import deps
+from app.models.user import User
+from app.schemas.user import UserInDB
+from app.services.auth import AuthService
+from app.tests.conftest import TEST_USERNAME
+
+pytestmark = pytest.mark.asyncio
+
+async def _current_user_id(client, auth_headers) -> int:
+    response = await client.get("/api/users/me", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+async def test_read_me_is_served_from_cache(client, auth_headers, engine):
+    """缓存命中时不再查询数据库，且缓存的是不可变快照"""
+    user_id = await _current_user_id(client, auth_headers)
+
+    cached = deps._user_cache[user_id]
+    assert isinstance(cached, UserInDB)
+    with pytest.raises(ValidationError):
+        cached.username = "changed"
+
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2])
+    )
+    response = await client.get("/api/users/me", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == TEST_USERNAME
+    assert statements == []
+
+async def test_update_me_does_not_leak_into_cached_user(
+    client,
+    auth_headers,
+    monkeypatch
+):
+    """更新过程中的未提交修改不会出现在缓存的用户中"""
+    update_user = AuthService.update_user
+    seen_in_cache = []
+
+    async def spy_update_user(user_id, user_update, db):
+        user = await update_user(user_id, user_update, db)
+        seen_in_cache.append(deps._user_cache[user_id].username)
+        return user
+
+    monkeypatch.setattr(AuthService, "update_user", spy_update_user)
+
+    # 冷缓存: 同一请求内加载当前用户并修改
+    response = await client.put(
+        "/api/users/me",
+        headers=auth_headers,
+        json={"username": "janedoe"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == "janedoe"
+    assert seen_in_cache == [TEST_USERNAME]
+
+    response = await client.get("/api/users/me", headers=auth_headers)
+    assert response.json()["username"] == "janedoe"
+
+async def test_update_me_invalidates_cached_user(client, auth_headers):
+    """更新后缓存失效，已取出的快照保持不变"""
+    user_id = await _current_user_id(client, auth_headers)
+    cached = deps._user_cache[user_id]
+
+    response = await client.put(
+        "/api/users/me",
+        headers=auth_headers,
+        json={"username": "janedoe"}
+    )
+    assert response.status_code == 200, response.text
+    assert cached.username == TEST_USERNAME
+    assert user_id not in deps._user_cache
+
+    response = await client.get("/api/users/me", headers=auth_headers)
+    assert response.json()["username"] == "janedoe"
+
+async def test_read_me_after_rolled_back_request(client, auth_headers):
+    """请求回滚不会使缓存的用户失效"""
+    # 冷缓存: 当前用户在将被回滚的请求中加载并缓存
+    response = await client.put(
+        "/api/users/me",
+        headers=auth_headers,
+        json={"username": "x"}
+    )
+    assert response.status_code == 422
+
+    response = await client.get("/api/users/me", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == TEST_USERNAME
+
+async def test_update_me_is_committed_before_response(
+    session_factory,
+    auth_headers
+):
+    """响应开始发送时修改已提交(依赖清理在响应之后执行)"""
+    committed = []
+
+    async def probe(scope, receive, send):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # 使用独立连接读取，只能看到已提交的数据
+                async with session_factory() as session:
+                    committed.append(
+                        await session.scalar(select(User.username))
+                    )
+            await send(message)
+
+        await app(scope, receive, send_wrapper)
+
+    async with AsyncClient(
+        transport=ASGITransport(app=probe),
+        base_url="http://test"
+    ) as client:
+        response = await client.put(
+            "/api/users/me",
+            headers=auth_headers,
+            json={"username": "janedoe"}
+        )
+    assert response.status_code == 200, response.text
+    assert committed == ["janedoe"]
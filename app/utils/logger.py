@@ -1,11 +1,15 @@
 # utils/logger.py
 import logging
 import sys
-from typing import Any
+from typing import Any, TYPE_CHECKING
 from pydantic import BaseModel
-from loguru import logger, Logger
+from loguru import logger
 from app.core.config import settings
 
+if TYPE_CHECKING:
+    # loguru.Logger 仅在类型存根中定义
+    from loguru import Logger
+
 class InterceptHandler(logging.Handler):
     """
     拦截标准库日志并重定向到loguru
@@ -60,7 +64,7 @@ def setup_logging() -> None:
         logging_logger = logging.getLogger(log_name)
         logging_logger.handlers = [InterceptHandler()]
 
-def get_logger() -> Logger:
+def get_logger() -> "Logger":
     """
     获取logger实例
     """
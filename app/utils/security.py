@@ -2,10 +2,19 @@
 from datetime import datetime, timedelta
 from typing import Any, Union
 from passlib.context import CryptContext
-from jose import jwt
+import jwt
+
+from app.core.config import settings
 
 # 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.ACCESS_BCRYPT_ROUNDS
+)
+
+# 用户不存在时用于校验的哈希，使登录耗时与用户是否存在无关
+DUMMY_PASSWORD_HASH = pwd_context.hash("x" * 12)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""